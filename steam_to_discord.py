@@ -2,12 +2,12 @@
 Steam → Discord Notifier (Python) — Replit/Render friendly (single file)
 
 What it does
-- Polls Steam Web API for a specific friend's status using their SteamID64.
-- When they transition to Online or start Playing a game, it pings you in a Discord channel.
+- Polls Steam Web API for one or more friends' status using their SteamID64s (one request per poll).
+- When one of them transitions to Online or starts Playing a game, it pings you in a Discord channel.
 - Supports either a Discord Webhook (simple) or a proper Discord Bot (BOT_MODE=true).
 
 Keep-Alive
-- Set KEEPALIVE=true to run a tiny HTTP server (stdlib) on port $PORT (Render) or 3000 (default).
+- Set KEEPALIVE=true to run a tiny HTTP server (asyncio, same event loop) on port $PORT (Render) or 3000 (default).
 - Point a monitor like UptimeRobot at your service URL to keep it awake (optional on Render).
 
 Environment variables
@@ -17,22 +17,27 @@ DISCORD_CHANNEL_ID=...        # required if BOT_MODE=true
 DISCORD_WEBHOOK_URL=...       # required if BOT_MODE=false
 DISCORD_USER_ID=...           # optional (your Discord ID to @mention)
 STEAM_API_KEY=...
-STEAM_FRIEND_ID64=...
+STEAM_FRIEND_ID64=...         # one SteamID64, or up to 100 comma-separated
 POLL_SECONDS=60
+POLL_MAX=300                  # optional: idle polling backs off up to this many seconds
+POLL_BACKOFF=1.5              # optional: interval multiplier per unchanged poll
+POLL_IDLE_STREAK=1            # optional: unchanged polls before each backoff step
 KEEPALIVE=true
 ONLY_ONLINE=false             # optional: true = alert only when they come online (ignore games)
 ONLY_GAMES=                   # optional: comma-separated game names (case-insensitive)
 """
 
+import asyncio
+import functools
+import hashlib
 import json
 import os
 import time
-import threading
 import signal
-from typing import Dict, Any, Tuple
-from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dataclasses import dataclass
+from typing import Dict, Any, FrozenSet, List, Optional, Tuple
 
-import requests
+import httpx
 
 # Optional .env for local dev
 try:
@@ -41,93 +46,256 @@ try:
 except Exception:
     pass
 
-# --------- Config ----------
-STEAM_API_KEY = os.getenv("STEAM_API_KEY", "").strip()
-STEAM_FRIEND_ID64 = os.getenv("STEAM_FRIEND_ID64", "").strip()
+# Optional orjson for faster (de)serialization; stdlib json otherwise
+try:
+    import orjson  # type: ignore
 
-# Webhook mode (simple) OR Bot mode (set BOT_MODE=true)
-DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL", "").strip()
-DISCORD_USER_ID = os.getenv("DISCORD_USER_ID", "").strip()  # to @mention
-POLL_SECONDS = max(15, int(os.getenv("POLL_SECONDS", "60")))  # be kind to APIs
+    def _json_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
 
-BOT_MODE = os.getenv("BOT_MODE", "").lower() in {"1", "true", "yes"}
-DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN", "").strip()
-DISCORD_CHANNEL_ID = os.getenv("DISCORD_CHANNEL_ID", "").strip()
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
 
-# Keep-alive HTTP
-KEEPALIVE = os.getenv("KEEPALIVE", "true").lower() in {"1", "true", "yes"}
-KEEPALIVE_PORT = int(os.getenv("PORT", "3000"))  # Render provides PORT; default 3000
-KEEPALIVE_HOST = "0.0.0.0"
+    _json_loads = json.loads
 
-# Filters
-ONLY_ONLINE = os.getenv("ONLY_ONLINE", "false").lower() in {"1", "true", "yes"}
-ONLY_GAMES = [g.strip().lower() for g in os.getenv("ONLY_GAMES", "").split(",") if g.strip()]
+# --------- Config ----------
+def _env_flag(name: str, default: str = "") -> bool:
+    return os.getenv(name, default).lower() in {"1", "true", "yes"}
+
+def _env_list(name: str) -> List[str]:
+    return [v.strip() for v in os.getenv(name, "").split(",") if v.strip()]
+
+@dataclass(frozen=True)
+class Config:
+    """Everything read from the environment, parsed once at import."""
+    steam_api_key: str
+    steam_friend_ids: Tuple[str, ...]
+    steam_friend_id64: str  # comma-joined ids; GetPlayerSummaries takes up to 100 per call
+
+    # Webhook mode (simple) OR Bot mode (set BOT_MODE=true)
+    bot_mode: bool
+    discord_webhook_url: str
+    discord_user_id: str  # to @mention
+    discord_bot_token: str
+    discord_channel_id: str
+
+    # Polling: POLL_SECONDS is the floor, idle polls back off towards poll_max
+    poll_seconds: int
+    poll_max: int
+    poll_backoff: float
+    poll_idle_streak: int
+
+    # Keep-alive HTTP
+    keepalive: bool
+    keepalive_host: str
+    keepalive_port: int
+
+    # Filters
+    only_online: bool
+    only_games: FrozenSet[str]
+
+    @classmethod
+    def from_env(cls) -> "Config":
+        friend_ids = tuple(_env_list("STEAM_FRIEND_ID64"))
+        poll_seconds = max(15, int(os.getenv("POLL_SECONDS", "60")))  # be kind to APIs
+        return cls(
+            steam_api_key=os.getenv("STEAM_API_KEY", "").strip(),
+            steam_friend_ids=friend_ids,
+            steam_friend_id64=",".join(friend_ids),
+            bot_mode=_env_flag("BOT_MODE"),
+            discord_webhook_url=os.getenv("DISCORD_WEBHOOK_URL", "").strip(),
+            discord_user_id=os.getenv("DISCORD_USER_ID", "").strip(),
+            discord_bot_token=os.getenv("DISCORD_BOT_TOKEN", "").strip(),
+            discord_channel_id=os.getenv("DISCORD_CHANNEL_ID", "").strip(),
+            poll_seconds=poll_seconds,
+            poll_max=max(poll_seconds, int(os.getenv("POLL_MAX", "300"))),
+            poll_backoff=max(1.0, float(os.getenv("POLL_BACKOFF", "1.5"))),
+            poll_idle_streak=max(1, int(os.getenv("POLL_IDLE_STREAK", "1"))),
+            keepalive=_env_flag("KEEPALIVE", "true"),
+            keepalive_host="0.0.0.0",
+            keepalive_port=int(os.getenv("PORT", "3000")),  # Render provides PORT; default 3000
+            only_online=_env_flag("ONLY_ONLINE", "false"),
+            only_games=frozenset(g.lower() for g in _env_list("ONLY_GAMES")),
+        )
+
+CFG = Config.from_env()
 
 STATUS_FILE = ".status.json"
+STATUS_FLUSH_SECONDS = 30  # debounce: write .status.json at most this often
+DISCORD_QUEUE_SIZE = 32  # pending notifications; the oldest is dropped when full
+DISCORD_SEND_ATTEMPTS = 5  # per notification, with exponential backoff between tries
 STEAM_SUMMARIES_URL = "https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2/"
-PERSONA_MAP = {0: "offline", 1: "online", 2: "busy", 3: "away", 4: "snooze", 5: "looking to trade", 6: "looking to play"}
-
-_shutdown = False  # graceful exit flag
+STEAM_COMMUNITY_USERS_URL = "https://steamcommunity.com/actions/ajaxresolveusers"  # fallback, no API key
+STATUS_STALE_SECONDS = 3 * 3600  # how long a cached status may stand in for a failing Steam API
+PERSONA_MAP = ("offline", "online", "busy", "away", "snooze", "looking to trade", "looking to play")  # by personastate
+
+_shutdown_evt: Optional[asyncio.Event] = None  # set on SIGTERM/SIGINT; created by main() inside the loop
+
+# One client for the whole process: connection reuse + HTTP/2 multiplexing.
+# httpx drops idle pooled connections after 5s by default, i.e. before every poll;
+# keep them around for a full (backed-off) poll interval so the TLS session is reused.
+# The transport retries new-connection failures only (DNS/TCP/TLS setup): a blip there would
+# otherwise cost a whole (possibly backed-off) poll interval or push Steam onto the fallbacks.
+# Errors on an established connection, read timeouts and HTTP statuses are not retried here;
+# the Steam fallbacks and the Discord queue handle those.
+_CLIENT = httpx.AsyncClient(
+    timeout=20,
+    transport=httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(max_connections=8, max_keepalive_connections=4, keepalive_expiry=CFG.poll_max + 30),
+    ),
+)
 
 # --------- Keep-alive HTTP server ----------
-class _OKHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        self._respond()
-
-    def do_HEAD(self):
-        self._respond(body=False)
-
-    def _respond(self, body: bool = True):
-        self.send_response(200)
-        self.send_header("Content-Type", "text/plain; charset=utf-8")
-        self.end_headers()
-        if body:
-            self.wfile.write(b"OK - Steam->Discord notifier is alive.")
-
-    def log_message(self, *args, **kwargs):
-        return  # silence default logging
-
-def start_keepalive():
-    def _run():
-        with ThreadingHTTPServer((KEEPALIVE_HOST, KEEPALIVE_PORT), _OKHandler) as httpd:
-            httpd.serve_forever(poll_interval=1)
-    t = threading.Thread(target=_run, daemon=True)
-    t.start()
+# The reply never changes, so it is encoded once at import time.
+_OK_BODY = b"OK - Steam->Discord notifier is alive.\n"
+_OK_HEAD = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: text/plain; charset=utf-8\r\n"
+    b"Content-Length: " + str(len(_OK_BODY)).encode() + b"\r\n"
+    b"Connection: close\r\n\r\n"
+)
+_OK_RESPONSE = _OK_HEAD + _OK_BODY
+
+async def _handle_ok(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Drain headers; we never look at them
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+            pass
+        writer.write(_OK_HEAD if request_line.startswith(b"HEAD") else _OK_RESPONSE)
+        await writer.drain()
+    except Exception:
+        pass
+    finally:
+        writer.close()
+
+async def start_keepalive() -> asyncio.AbstractServer:
+    return await asyncio.start_server(_handle_ok, CFG.keepalive_host, CFG.keepalive_port)
 
 # --------- Persistence ----------
-def load_last_status() -> Dict[str, Any]:
+def load_last_status() -> Dict[str, Dict[str, Any]]:
+    """Return the last-notified status per friend: {steamid64: status}."""
     if not os.path.exists(STATUS_FILE):
         return {}
     try:
-        with open(STATUS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(STATUS_FILE, "rb") as f:
+            data = _json_loads(f.read())
     except Exception:
         return {}
-
-def save_last_status(data: Dict[str, Any]) -> None:
+    if "personastate" in data:
+        # Old single-friend file: one status dict at the top level
+        steamid = data.get("steamid") or (CFG.steam_friend_ids[0] if len(CFG.steam_friend_ids) == 1 else None)
+        return {steamid: data} if steamid else {}
+    return data
+
+def save_last_status(data: Dict[str, Dict[str, Any]]) -> None:
+    # Write-then-rename so a crash mid-write never leaves a truncated file behind
+    tmp = STATUS_FILE + ".tmp"
     try:
-        with open(STATUS_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f)
+        with open(tmp, "wb") as f:
+            f.write(_json_dumps(data))
+        os.replace(tmp, STATUS_FILE)
     except Exception:
         pass
 
 # --------- Steam ----------
-def fetch_steam_status() -> Dict[str, Any]:
-    params = {"key": STEAM_API_KEY, "steamids": STEAM_FRIEND_ID64}
-    r = requests.get(STEAM_SUMMARIES_URL, params=params, timeout=20)
+# steamid64 -> (status, fresh_until, stale_until)
+_status_cache: Dict[str, Tuple[Dict[str, Any], float, float]] = {}
+
+# Digest of the last GetPlayerSummaries body and its decoded player list;
+# an identical body (the common case) skips JSON decoding entirely.
+_last_body_hash = b""
+_last_players: List[Dict[str, Any]] = []
+
+def prime_status_cache(statuses: Dict[str, Dict[str, Any]], fresh: float = CFG.poll_seconds - 1) -> None:
+    """Seed the cache from persisted statuses (e.g. .status.json) so a restart starts warm."""
+    for steamid, status in statuses.items():
+        ts = status.get("timestamp")
+        if steamid in CFG.steam_friend_ids and isinstance(ts, (int, float)):
+            _status_cache[steamid] = (status, ts + fresh, ts + STATUS_STALE_SECONDS)
+
+def _is_transient(e: Exception) -> bool:
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500
+    return isinstance(e, httpx.TransportError)  # timeouts, connection resets, DNS, ...
+
+async def _cached_fetch() -> Dict[str, Dict[str, Any]]:
+    """fetch_steam_status() backed by _status_cache.
+
+    On a transient Steam failure, returns the cached copies (flagged stale=True) for up to
+    STATUS_STALE_SECONDS after they were fetched.
+    """
+    now = time.time()
+    hits = {sid: _status_cache.get(sid) for sid in CFG.steam_friend_ids}
+    # Polls are at least POLL_SECONDS apart, so entries are only still fresh here when
+    # prime_status_cache seeded them from .status.json right after a restart.
+    if all(h and now < h[1] for h in hits.values()):
+        return {sid: h[0] for sid, h in hits.items()}
+    try:
+        value = await fetch_steam_status()
+    except Exception as e:
+        cached = {sid: {**h[0], "stale": True} for sid, h in hits.items() if h and now < h[2]}
+        if cached and _is_transient(e):
+            print(f"[warn] Steam unavailable ({e}); using cached status")
+            return cached
+        raise
+    for sid, status in value.items():
+        _status_cache[sid] = (status, now + CFG.poll_seconds - 1, now + STATUS_STALE_SECONDS)
+    return value
+
+async def fetch_steam_status() -> Dict[str, Dict[str, Any]]:
+    """Fetch every watched friend: {steamid64: status}.
+
+    Uses the Web API; if that fails transiently, falls back to the Steam Community endpoint.
+    """
+    try:
+        return await _fetch_via_web_api()
+    except Exception as e:
+        if not _is_transient(e):
+            raise
+        try:
+            statuses = await _fetch_via_community()
+        except Exception as community_error:
+            print(f"[warn] Steam Community fallback failed too: {community_error}")
+            raise e
+        print(f"[warn] Steam Web API unavailable ({e}); using Steam Community data")
+        return statuses
+
+async def _fetch_via_web_api() -> Dict[str, Dict[str, Any]]:
+    """All watched friends in one GetPlayerSummaries call."""
+    params = {"key": CFG.steam_api_key, "steamids": CFG.steam_friend_id64}
+    r = await _CLIENT.get(STEAM_SUMMARIES_URL, params=params)
     r.raise_for_status()
-    players = r.json().get("response", {}).get("players", [])
+    players = _decode_players(r.content)
     if not players:
         raise RuntimeError("No player data returned — check SteamID64 and API key.")
-    p = players[0]
+    return {p["steamid"]: _parse_player(p) for p in players if p.get("steamid") in CFG.steam_friend_ids}
+
+def _decode_players(body: bytes) -> List[Dict[str, Any]]:
+    global _last_body_hash, _last_players
+    h = hashlib.blake2b(body, digest_size=16).digest()
+    if h != _last_body_hash:
+        _last_players = _json_loads(body).get("response", {}).get("players", [])
+        _last_body_hash = h
+    return _last_players
+
+def _persona_label(personastate: int) -> str:
+    return PERSONA_MAP[personastate] if 0 <= personastate < len(PERSONA_MAP) else f"unknown({personastate})"
+
+def _parse_player(p: Dict[str, Any]) -> Dict[str, Any]:
     personastate = int(p.get("personastate", 0))
-    state_label = PERSONA_MAP.get(personastate, f"unknown({personastate})")
+    state_label = _persona_label(personastate)
     in_game = "gameextrainfo" in p
     game = p.get("gameextrainfo")
     name = p.get("personaname", "Friend")
     avatar = p.get("avatarfull")
     profile_url = p.get("profileurl")
     return {
+        "steamid": p["steamid"],
         "name": name,
         "state": state_label,
         "personastate": personastate,
@@ -138,101 +306,292 @@ def fetch_steam_status() -> Dict[str, Any]:
         "timestamp": int(time.time()),
     }
 
-# --------- Notify logic ----------
-def should_notify(prev: Dict[str, Any], curr: Dict[str, Any]) -> Tuple[bool, str]:
-    """Return (notify?, reason)."""
-    prev_state = int(prev.get("personastate", 0)) if prev else 0
-    curr_state = int(curr.get("personastate", 0))
-    prev_in_game = bool(prev.get("in_game")) if prev else False
-    curr_in_game = bool(curr.get("in_game"))
+async def _fetch_via_community() -> Dict[str, Dict[str, Any]]:
+    """Persona state from steamcommunity.com, in the same shape as the Web API path.
 
-    # Game filters (if set)
-    if curr_in_game and ONLY_GAMES:
-        game_name = (curr.get("game") or "").lower()
-        if game_name and game_name not in ONLY_GAMES:
-            # Playing a game but not one we care about
-            # Still allow Online transition if ONLY_ONLINE is false and they just came online
-            pass
+    This endpoint carries no game info, so game fields (and avatar/profile) are carried
+    over from the last Web API status; otherwise every fallback poll would look like
+    the friend stopped playing.
+    """
+    r = await _CLIENT.get(STEAM_COMMUNITY_USERS_URL, params={"steamids": CFG.steam_friend_id64})
+    r.raise_for_status()
+    users = _json_loads(r.content)
+    if not isinstance(users, list) or not users:
+        raise RuntimeError("No player data returned by Steam Community.")
+    statuses = {}
+    for u in users:
+        steamid = str(u.get("steamid", ""))
+        if steamid not in CFG.steam_friend_ids:
+            continue
+        hit = _status_cache.get(steamid)
+        last = hit[0] if hit else {}
+        personastate = int(u.get("persona_state", 0))
+        in_game = personastate > 0 and bool(last.get("in_game"))
+        statuses[steamid] = {
+            "steamid": steamid,
+            "name": u.get("persona_name") or last.get("name", "Friend"),
+            "state": _persona_label(personastate),
+            "personastate": personastate,
+            "in_game": in_game,
+            "game": last.get("game") if in_game else None,
+            "avatar": last.get("avatar"),
+            "profile_url": last.get("profile_url") or f"https://steamcommunity.com/profiles/{steamid}/",
+            "timestamp": int(time.time()),
+        }
+    if not statuses:
+        # Re-raised as the Web API error by fetch_steam_status, so the stale cache still applies
+        raise RuntimeError("Steam Community returned none of the configured SteamID64s.")
+    return statuses
 
+# --------- Notify logic ----------
+def _notify_rule(prev_online: bool, curr_online: bool, prev_in_game: bool, curr_in_game: bool,
+                 only_online: bool, only_games: bool) -> Tuple[bool, str]:
+    """The transition rules, before the per-game name filter. Only used to build _NOTIFY_TABLE."""
     # 1) Offline → Online
-    if prev_state == 0 and curr_state > 0:
-        if ONLY_GAMES and ONLY_ONLINE:
+    if not prev_online and curr_online:
+        if only_games and only_online:
             # If ONLY_ONLINE=true and ONLY_GAMES set, suppress generic online messages
             return False, ""
         return True, "came online"
 
     # 2) Started playing
     if not prev_in_game and curr_in_game:
-        if ONLY_GAMES:
-            game_name = (curr.get("game") or "").lower()
-            if game_name and game_name not in ONLY_GAMES:
-                return False, ""
-        if ONLY_ONLINE:
+        if only_online:
             return False, ""
         return True, "started playing"
 
     return False, ""
 
-def _mention_prefix() -> str:
-    return f"<@{DISCORD_USER_ID}> " if DISCORD_USER_ID else ""
+# Every combination of the six booleans, precomputed; indexed by the mask built in should_notify
+_NOTIFY_TABLE: Tuple[Tuple[bool, str], ...] = tuple(
+    _notify_rule(*(bool(mask >> bit & 1) for bit in (5, 4, 3, 2, 1, 0))) for mask in range(64)
+)
 
-def send_discord_webhook(curr: Dict[str, Any], reason: str) -> None:
-    if not DISCORD_WEBHOOK_URL:
-        print("[warn] No DISCORD_WEBHOOK_URL provided; skipping notify.")
-        return
-    title = f"{curr['name']} {reason}!"
-    desc = (
-        f"Status: **{curr['state']}**\n"
-        + (f"Game: **{curr['game']}**\n" if curr["in_game"] and curr.get("game") else "")
-        + (f"Profile: {curr['profile_url']}\n" if curr.get("profile_url") else "")
+def should_notify(prev: Dict[str, Any], curr: Dict[str, Any], *, _cfg: Config = CFG) -> Tuple[bool, str]:
+    """Return (notify?, reason)."""
+    prev = prev or {}
+    mask = (
+        (int(prev.get("personastate", 0)) != 0) << 5
+        | (int(curr.get("personastate", 0)) > 0) << 4
+        | bool(prev.get("in_game")) << 3
+        | bool(curr.get("in_game")) << 2
+        | _cfg.only_online << 1
+        | bool(_cfg.only_games)
     )
-    payload = {
-        "content": _mention_prefix() + "Steam update:",
-        "embeds": [{"title": title, "description": desc, "thumbnail": {"url": curr.get("avatar", "")}}],
-        "allowed_mentions": {"parse": ["users"]},
-    }
-    r = requests.post(DISCORD_WEBHOOK_URL, json=payload, timeout=20)
+    notify, reason = _NOTIFY_TABLE[mask]
+
+    # Playing a game, but not one we care about
+    if reason == "started playing" and _cfg.only_games:
+        game_name = (curr.get("game") or "").lower()
+        if game_name and game_name not in _cfg.only_games:
+            return False, ""
+    return notify, reason
+
+def _mention_prefix(cfg: Config) -> str:
+    return f"<@{cfg.discord_user_id}> " if cfg.discord_user_id else ""
+
+# Everything that doesn't depend on the status is built once (per config)
+_ALLOWED_MENTIONS = {"parse": ["users"]}
+_DESC_TMPL = "Status: **{state}**\n{game_line}{profile_line}"
+_WEBHOOK_HEADERS = {"Content-Type": "application/json"}
+
+@functools.lru_cache(maxsize=None)
+def _message_content(cfg: Config) -> str:
+    return _mention_prefix(cfg) + "Steam update:"
+
+@functools.lru_cache(maxsize=None)
+def _bot_target(cfg: Config) -> Tuple[str, Dict[str, str]]:
+    """(channel messages URL, headers) for bot mode."""
+    url = f"https://discord.com/api/v10/channels/{cfg.discord_channel_id}/messages"
+    return url, {"Content-Type": "application/json", "Authorization": f"Bot {cfg.discord_bot_token}"}
+
+def _build_payload(curr: Dict[str, Any], reason: str, *, _cfg: Config = CFG) -> bytes:
+    """Serialize the Discord message (content + one embed) for a status change."""
+    game = curr.get("game") if curr["in_game"] else None
+    profile_url = curr.get("profile_url")
+    desc = _DESC_TMPL.format_map({
+        "state": curr["state"],
+        "game_line": f"Game: **{game}**\n" if game else "",
+        "profile_line": f"Profile: {profile_url}\n" if profile_url else "",
+    })
+    embed: Dict[str, Any] = {"title": f"{curr['name']} {reason}!", "description": desc}
+    if curr.get("avatar"):  # unknown on a cold-cache Community fallback; Discord rejects a null url
+        embed["thumbnail"] = {"url": curr["avatar"]}
+    return _json_dumps({
+        "content": _message_content(_cfg),
+        "embeds": [embed],
+        "allowed_mentions": _ALLOWED_MENTIONS,
+    })
+
+# url -> time.monotonic() before which Discord has asked us not to POST there
+_discord_not_before: Dict[str, float] = {}
+
+def _header_seconds(r: httpx.Response, name: str, default: float) -> float:
+    try:
+        return max(0.0, float(r.headers.get(name, default)))
+    except ValueError:
+        return default
+
+def _note_rate_limit(url: str, r: httpx.Response) -> float:
+    """Record Discord's rate-limit headers for `url`; return how long to hold off (0 if not limited)."""
+    if r.status_code == 429:
+        wait = _header_seconds(r, "Retry-After", 1.0)
+    elif r.headers.get("X-RateLimit-Remaining") == "0":
+        wait = _header_seconds(r, "X-RateLimit-Reset-After", 0.0)
+    else:
+        return 0.0
+    _discord_not_before[url] = time.monotonic() + wait
+    return wait
+
+async def _wait_for_rate_limit(url: str) -> None:
+    wait = _discord_not_before.get(url, 0.0) - time.monotonic()
+    if wait > 0:
+        print(f"[ratelimit] holding Discord send for {wait:.1f}s")
+        await asyncio.sleep(wait)
+
+async def _post_discord(url: str, headers: Dict[str, str], payload: bytes, what: str) -> None:
+    for attempt in range(2):  # one immediate re-post after a 429, once Retry-After has passed
+        await _wait_for_rate_limit(url)
+        r = await _CLIENT.post(url, content=payload, headers=headers)
+        wait = _note_rate_limit(url, r)
+        if r.status_code != 429 or attempt:
+            break
+        print(f"[ratelimit] {what} got 429 (Retry-After {wait:.1f}s)")
     if r.status_code >= 300:
-        print(f"[error] Webhook failed: {r.status_code} {r.text}")
+        print(f"[error] {what} failed: {r.status_code} {r.text}")
+        r.raise_for_status()
 
-def send_discord_bot(curr: Dict[str, Any], reason: str) -> None:
-    if not (DISCORD_BOT_TOKEN and DISCORD_CHANNEL_ID):
+async def send_discord_webhook(curr: Dict[str, Any], reason: str, *, _cfg: Config = CFG) -> None:
+    if not _cfg.discord_webhook_url:
+        print("[warn] No DISCORD_WEBHOOK_URL provided; skipping notify.")
+        return
+    payload = _build_payload(curr, reason, _cfg=_cfg)
+    await _post_discord(_cfg.discord_webhook_url, _WEBHOOK_HEADERS, payload, "Webhook")
+
+async def send_discord_bot(curr: Dict[str, Any], reason: str, *, _cfg: Config = CFG) -> None:
+    if not (_cfg.discord_bot_token and _cfg.discord_channel_id):
         print("[warn] BOT_MODE enabled but token/channel missing; skipping notify.")
         return
-    url = f"https://discord.com/api/v10/channels/{DISCORD_CHANNEL_ID}/messages"
-    title = f"{curr['name']} {reason}!"
-    desc = (
-        f"Status: **{curr['state']}**\n"
-        + (f"Game: **{curr['game']}**\n" if curr["in_game"] and curr.get("game") else "")
-        + (f"Profile: {curr['profile_url']}\n" if curr.get("profile_url") else "")
-    )
-    json_payload = {
-        "content": _mention_prefix() + "Steam update:",
-        "embeds": [{"title": title, "description": desc, "thumbnail": {"url": curr.get("avatar", "")}}],
-        "allowed_mentions": {"parse": ["users"]},
-    }
-    headers = {"Authorization": f"Bot {DISCORD_BOT_TOKEN}"}
-    r = requests.post(url, headers=headers, json=json_payload, timeout=20)
-    if r.status_code >= 300:
-        print(f"[error] Bot send failed: {r.status_code} {r.text}")
+    url, headers = _bot_target(_cfg)
+    await _post_discord(url, headers, _build_payload(curr, reason, _cfg=_cfg), "Bot send")
+
+async def send_discord(curr: Dict[str, Any], reason: str, *, _cfg: Config = CFG) -> None:
+    if _cfg.bot_mode:
+        await send_discord_bot(curr, reason, _cfg=_cfg)
+    else:
+        await send_discord_webhook(curr, reason, _cfg=_cfg)
+
+# --------- Discord send queue ----------
+# The poller only enqueues; a single worker task does the (possibly slow) POSTs,
+# so a stalled or rate-limited Discord never delays the next Steam poll.
+Notification = Tuple[Dict[str, Any], str]  # (status, reason)
+
+def enqueue_notify(outbox: "asyncio.Queue[Notification]", curr: Dict[str, Any], reason: str) -> None:
+    try:
+        outbox.put_nowait((curr, reason))
+    except asyncio.QueueFull:
+        dropped, _ = outbox.get_nowait()  # drop the oldest; the newest status matters most
+        outbox.task_done()
+        print(f"[warn] Discord queue full; dropped a notification for {dropped['name']}")
+        outbox.put_nowait((curr, reason))
+
+def _is_retryable(e: Exception) -> bool:
+    if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 429:
+        return True
+    return _is_transient(e)
+
+async def _send_with_retry(curr: Dict[str, Any], reason: str) -> None:
+    delay = 1.0
+    for attempt in range(1, DISCORD_SEND_ATTEMPTS + 1):
+        try:
+            await send_discord(curr, reason)
+            return
+        except Exception as e:
+            if not _is_retryable(e) or attempt == DISCORD_SEND_ATTEMPTS:
+                print(f"[error] Giving up on notification for {curr['name']}: {e}")
+                return
+            print(f"[warn] Discord send failed ({e}); retry {attempt}/{DISCORD_SEND_ATTEMPTS - 1} in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+
+async def sender_worker(outbox: "asyncio.Queue[Notification]") -> None:
+    while True:
+        curr, reason = await outbox.get()
+        try:
+            await _send_with_retry(curr, reason)
+        finally:
+            outbox.task_done()
 
 # --------- Main loop ----------
-def _handle_sigterm(signum, frame):
-    global _shutdown
-    _shutdown = True
+def _install_signal_handlers(loop: asyncio.AbstractEventLoop, evt: asyncio.Event) -> None:
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            # asyncio installs a no-op Python handler and reads the signal number back from
+            # its set_wakeup_fd self-pipe, then runs evt.set as an ordinary loop callback
+            loop.add_signal_handler(sig, evt.set)
+        except (NotImplementedError, RuntimeError):
+            # e.g. Windows: fall back to a plain handler that pokes the loop's self-pipe
+            signal.signal(sig, lambda signum, frame: loop.call_soon_threadsafe(evt.set))
+
+async def _sleep_unless_shutdown(seconds: float) -> None:
+    try:
+        await asyncio.wait_for(_shutdown_evt.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+
+def _fingerprint(curr: Dict[str, Any]) -> Tuple[int, bool, Any]:
+    """The parts of a status that count as a change for adaptive polling."""
+    return int(curr.get("personastate", 0)), bool(curr.get("in_game")), curr.get("game")
 
-signal.signal(signal.SIGTERM, _handle_sigterm)
-signal.signal(signal.SIGINT, _handle_sigterm)
+async def poll_task(
+    state: Dict[str, Dict[str, Any]],
+    outbox: "asyncio.Queue[Notification]",
+) -> Tuple[Dict[str, Dict[str, Any]], Optional[Dict[str, Dict[str, Any]]]]:
+    """Run one poll cycle; return (last-notified state per friend, statuses seen or None on error).
+
+    The returned state is a new dict whenever it changed; persisting it is up to the caller.
+    """
+    statuses = None
+    try:
+        statuses = await _cached_fetch()
+
+        for steamid, curr in statuses.items():
+            # Heartbeat in logs
+            print(f"[poll] {time.strftime('%H:%M:%S')} — {curr['name']}: state={curr['state']}, "
+                  f"in_game={curr['in_game']}, game={curr.get('game')}"
+                  + (" (cached)" if curr.get("stale") else ""))
 
-def main():
-    if not (STEAM_API_KEY and STEAM_FRIEND_ID64):
+            notify, reason = should_notify(state.get(steamid, {}), curr)
+            if notify:
+                print(f"[notify] {curr['name']} {reason} (game={curr.get('game')})")
+                enqueue_notify(outbox, curr, reason)
+                state = {**state, steamid: {k: v for k, v in curr.items() if k != "stale"}}
+
+    except httpx.HTTPError as e:
+        print("[error] HTTP:", e)
+    except Exception as e:
+        print("[error]", e)
+    return state, statuses
+
+async def main():
+    global _shutdown_evt
+    if not (CFG.steam_api_key and CFG.steam_friend_id64):
         raise SystemExit("Please set STEAM_API_KEY and STEAM_FRIEND_ID64 as env vars (or in .env locally).")
-    if not BOT_MODE and not DISCORD_WEBHOOK_URL:
+    if len(CFG.steam_friend_ids) > 100:
+        raise SystemExit("STEAM_FRIEND_ID64 accepts at most 100 comma-separated SteamID64s.")
+    if not CFG.bot_mode and not CFG.discord_webhook_url:
         raise SystemExit("Provide DISCORD_WEBHOOK_URL (webhook mode) or set BOT_MODE=true with bot token+channel.")
 
-    if KEEPALIVE:
-        start_keepalive()
-        print(f"[keepalive] HTTP server on http://{KEEPALIVE_HOST}:{KEEPALIVE_PORT}/")
+    _shutdown_evt = asyncio.Event()
+    _install_signal_handlers(asyncio.get_running_loop(), _shutdown_evt)
+
+    outbox: "asyncio.Queue[Notification]" = asyncio.Queue(maxsize=DISCORD_QUEUE_SIZE)
+    sender = asyncio.create_task(sender_worker(outbox))
+
+    server = None
+    if CFG.keepalive:
+        server = await start_keepalive()
+        print(f"[keepalive] HTTP server on http://{CFG.keepalive_host}:{CFG.keepalive_port}/")
 
     # 🔔 Startup notification
     startup_message = {
@@ -245,38 +604,60 @@ def main():
         "profile_url": "",
         "timestamp": int(time.time())
     }
-    if BOT_MODE:
-        send_discord_bot(startup_message, "started up ✅")
-    else:
-        send_discord_webhook(startup_message, "started up ✅")
+    enqueue_notify(outbox, startup_message, "started up ✅")
 
     state = load_last_status()
-    print("Steam → Discord notifier running. Poll interval:", POLL_SECONDS, "seconds")
+    prime_status_cache(state)
+    print("Steam → Discord notifier running. Poll interval:", CFG.poll_seconds, "seconds",
+          f"(backs off x{CFG.poll_backoff:g} up to {CFG.poll_max}s when idle)")
 
-    while not _shutdown:
-        try:
-            curr = fetch_steam_status()
-
-            # Heartbeat in logs
-            print(f"[poll] {time.strftime('%H:%M:%S')} — state={curr['state']}, "
-                  f"in_game={curr['in_game']}, game={curr.get('game')}")
+    interval: float = CFG.poll_seconds
+    idle_polls = 0
+    last_seen = None
+    dirty = False
+    last_flush = 0.0
 
-            notify, reason = should_notify(state, curr)
-            if notify:
-                print(f"[notify] {curr['name']} {reason} (game={curr.get('game')})")
-                if BOT_MODE:
-                    send_discord_bot(curr, reason)
-                else:
-                    send_discord_webhook(curr, reason)
-                state = curr
+    try:
+        while not _shutdown_evt.is_set():
+            prev_state = state
+            state, statuses = await poll_task(state, outbox)
+
+            # State lives in memory; flush it to disk only when it changed, at most every N seconds
+            notified = state is not prev_state
+            dirty = dirty or notified
+            if dirty and time.time() - last_flush > STATUS_FLUSH_SECONDS:
                 save_last_status(state)
-
-        except requests.HTTPError as e:
-            print("[error] HTTP:", e)
-        except Exception as e:
-            print("[error]", e)
-
-        time.sleep(POLL_SECONDS)
+                dirty, last_flush = False, time.time()
+
+            # Adaptive polling: back off geometrically while nothing changes,
+            # snap back to the floor on a notification or any other observed change
+            if statuses is not None:
+                seen = {sid: _fingerprint(curr) for sid, curr in statuses.items()}
+                if not notified and seen == last_seen:
+                    idle_polls += 1
+                    if idle_polls >= CFG.poll_idle_streak and interval < CFG.poll_max:
+                        interval = min(CFG.poll_max, interval * CFG.poll_backoff)
+                        idle_polls = 0
+                        print(f"[poll] no change, interval now {interval:.0f}s")
+                else:
+                    if interval != CFG.poll_seconds:
+                        print(f"[poll] change seen, interval back to {CFG.poll_seconds}s")
+                    interval, idle_polls, last_seen = CFG.poll_seconds, 0, seen
+
+            await _sleep_unless_shutdown(interval)
+    finally:
+        if dirty:
+            save_last_status(state)
+        # Give queued notifications a moment to go out before exiting
+        try:
+            await asyncio.wait_for(outbox.join(), timeout=10)
+        except asyncio.TimeoutError:
+            print(f"[warn] Exiting with {outbox.qsize()} notification(s) unsent")
+        sender.cancel()
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+        await _CLIENT.aclose()
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())